@@ -8,6 +8,8 @@
 #   "pandas",
 #   "db-sqlite3",
 #   "scipy",
+#   "numpy",
+#   "pillow",
 #   "pybase64",
 #   "python-dotenv",
 #   "httpx",
@@ -19,6 +21,7 @@
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import subprocess
 from tasksA import *
 from tasksB import *
@@ -28,6 +31,26 @@ import os
 import re
 import httpx
 import json
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled LLM client for the lifetime of the app
+    app.state.llm_client = create_llm_client()
+    # Optional live index of recent logs for A5, e.g. LOG_INDEX_DIR=/data/logs
+    if os.getenv("LOG_INDEX_DIR"):
+        start_log_index(os.getenv("LOG_INDEX_DIR"), poll_interval=float(os.getenv("LOG_INDEX_POLL_INTERVAL", "1.0")))
+    try:
+        yield
+    finally:
+        stop_log_indexes()
+        await app.state.llm_client.aclose()
 
 app = FastAPI()
 
@@ -40,7 +63,7 @@ app.add_middleware(
 )
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 load_dotenv()
 
 # @app.get('/ask')
@@ -80,8 +103,8 @@ load_dotenv()
 #         return JSONResponse(content={"error": "Failed to get response", "details": response.text}, status_code=response.status_code)
 
 @app.get("/ask")
-def ask(prompt: str):
-    result = get_completions(prompt)
+async def ask(prompt: str):
+    result = await get_completions(prompt)
     return result
 
 openai_api_chat  = "http://aiproxy.sanand.workers.dev/openai/v1/chat/completions" # for testing
@@ -92,6 +115,32 @@ headers = {
     "Content-Type": "application/json",
 }
 
+# Pool settings for the shared LLM client, overridable through the environment
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "false").lower() in ("1", "true", "yes")
+
+def create_llm_client():
+    limits = httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+    try:
+        return httpx.AsyncClient(timeout=LLM_TIMEOUT, limits=limits, headers=headers, http2=LLM_HTTP2)
+    except ImportError:
+        # http2=True needs the optional `h2` package, fall back to HTTP/1.1 keep-alive
+        return httpx.AsyncClient(timeout=LLM_TIMEOUT, limits=limits, headers=headers)
+
+def get_llm_client():
+    # The lifespan handler creates the client; this covers calls made outside of it
+    client = getattr(app.state, "llm_client", None)
+    if client is None or client.is_closed:
+        client = app.state.llm_client = create_llm_client()
+    return client
+
 function_definitions_llm = [
     {
         "name": "A1",
@@ -315,14 +364,14 @@ function_definitions_llm = [
     },
     {
         "name": "B5",
-        "description": "Execute a SQL query on a specified database file and save the result to an output file.",
+        "description": "Execute a SQL query on a database file, or on CSV/JSON/JSONL/log files under /data through DuckDB, and save the result to an output file.",
         "parameters": {
             "type": "object",
             "properties": {
                 "db_path": {
                     "type": "string",
-                    "pattern": r".*/(.*\.db)",
-                    "description": "Path to the SQLite database file."
+                    "pattern": r"/data/.*",
+                    "description": "Path to the SQLite/DuckDB database file, a CSV/JSON/JSONL/log file, or a directory of them. Files are queried as tables named after the file."
                 },
                 "query": {
                     "type": "string",
@@ -330,8 +379,17 @@ function_definitions_llm = [
                 },
                 "output_filename": {
                     "type": "string",
-                    "pattern": r".*/(.*\.txt)",
-                    "description": "Path to the file where the query result will be saved."
+                    "pattern": r".*/(.*\.(txt|csv|jsonl|parquet))",
+                    "description": "Path to the file where the query result will be saved. The extension picks the format."
+                },
+                "threads": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "description": "Optional. Number of DuckDB threads."
+                },
+                "explain": {
+                    "type": "boolean",
+                    "description": "Optional. Save the query plan instead of the result."
                 }
             },
             "required": ["db_path", "query", "output_filename"]
@@ -339,7 +397,7 @@ function_definitions_llm = [
     },
     {
         "name": "B6",
-        "description": "Fetch content from a URL and save it to the specified output file.",
+        "description": "Fetch content from a URL, or from a list or file of URLs, and save it to the specified output file or directory.",
         "parameters": {
             "type": "object",
             "properties": {
@@ -348,13 +406,23 @@ function_definitions_llm = [
                     "pattern": r"https?://.*",
                     "description": "URL to fetch content from."
                 },
+                "urls": {
+                    "type": "array",
+                    "items": {"type": "string", "pattern": r"https?://.*"},
+                    "description": "Optional. Several URLs to fetch concurrently."
+                },
+                "urls_file": {
+                    "type": "string",
+                    "pattern": r".*/.*",
+                    "description": "Optional. File with one URL per line to fetch concurrently."
+                },
                 "output_filename": {
                     "type": "string",
                     "pattern": r".*/.*",
-                    "description": "Path to the file where the content will be saved."
+                    "description": "Path to the file where the content will be saved. For several URLs, a directory or a .jsonl archive."
                 }
             },
-            "required": ["url", "output_filename"]
+            "required": ["output_filename"]
         }
     },
     {
@@ -389,19 +457,19 @@ function_definitions_llm = [
     },
     {
         "name": "B9",
-        "description": "Convert a Markdown file to another format and save the result to the specified output path.",
+        "description": "Convert a Markdown file, or a directory of Markdown files, to HTML and save the result to the specified output path.",
         "parameters": {
             "type": "object",
             "properties": {
                 "md_path": {
                     "type": "string",
-                    "pattern": r".*/(.*\.md)",
-                    "description": "Path to the Markdown file to be converted."
+                    "pattern": r".*/(.*\.md|[^.]*)",
+                    "description": "Path to the Markdown file, or directory of .md files, to be converted."
                 },
                 "output_path": {
                     "type": "string",
                     "pattern": r".*/.*",
-                    "description": "Path where the converted file will be saved."
+                    "description": "Path where the converted file will be saved, or the output directory for a directory of files."
                 }
             },
             "required": ["md_path", "output_path"]
@@ -410,30 +478,113 @@ function_definitions_llm = [
 
 ]
 
-def get_completions(prompt: str):
-    with httpx.Client(timeout=20) as client:
-        response = client.post(
-            f"{openai_api_chat}",
-            headers=headers,
-            json=
-                {
-                    "model": "gpt-4o-mini",
-                    "messages": [
-                                    {"role": "system", "content": "You are a function classifier that extracts structured parameters from queries."},
-                                    {"role": "user", "content": prompt}
-                                ],
-                    "tools": [
-                                {
-                                    "type": "function",
-                                    "function": function
-                                } for function in function_definitions_llm
+class CompletionCache:
+    """LRU + TTL cache of prompt -> tool call, with an optional SQLite tier that survives restarts."""
+
+    def __init__(self, max_entries=1024, ttl=24 * 3600, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(prompt, functions):
+        # Whitespace-normalized prompt + hash of the tool schema, so editing the tools invalidates old entries
+        normalized = " ".join(prompt.split())
+        tools_hash = hashlib.sha256(json.dumps(functions, sort_keys=True).encode()).hexdigest()
+        return hashlib.sha256(f"{tools_hash}:{normalized}".encode()).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._entries.pop(key, None)
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM completions WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] < self.ttl:
+                    value = json.loads(row[0])
+                    self._store(key, value, row[1])
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._store(key, value, now)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO completions VALUES (?, ?, ?)", (key, json.dumps(value), now))
+                self._db.execute("DELETE FROM completions WHERE created < ?", (now - self.ttl,))
+                self._db.commit()
+
+    def _store(self, key, value, created):
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "persistent": self._db is not None,
+        }
+
+completion_cache = CompletionCache(
+    max_entries=int(os.getenv("LLM_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("LLM_CACHE_TTL", str(24 * 3600))),
+    db_path=os.getenv("LLM_CACHE_DB"),
+)
+
+async def get_completions(prompt: str):
+    cache_key = CompletionCache.make_key(prompt, function_definitions_llm)
+    cached = completion_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    client = get_llm_client()
+    response = await client.post(
+        f"{openai_api_chat}",
+        json=
+            {
+                "model": "gpt-4o-mini",
+                "messages": [
+                                {"role": "system", "content": "You are a function classifier that extracts structured parameters from queries."},
+                                {"role": "user", "content": prompt}
                             ],
-                    "tool_choice": "auto"
-                },
-        )
+                "tools": [
+                            {
+                                "type": "function",
+                                "function": function
+                            } for function in function_definitions_llm
+                        ],
+                "tool_choice": "auto"
+            },
+    )
     # return response.json()
-    print(response.json()["choices"][0]["message"]["tool_calls"][0]["function"])
-    return response.json()["choices"][0]["message"]["tool_calls"][0]["function"]
+    function = response.json()["choices"][0]["message"]["tool_calls"][0]["function"]
+    print(function)
+    completion_cache.set(cache_key, function)
+    return function
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return completion_cache.stats()
 
 
 # Placeholder for task execution
@@ -444,7 +595,7 @@ async def run_task(task: str):
         # Replace with actual logic to parse task and execute steps
         # Example: Execute task and return success or error based on result
         # llm_response = function_calling(tast), function_name = A1
-        response = get_completions(task)
+        response = await get_completions(task)
         print(response)
         task_code = response['name']
         arguments = response['arguments']
@@ -478,7 +629,8 @@ async def run_task(task: str):
         if "B5" == task_code:
             B5(**json.loads(arguments))
         if "B6" == task_code:
-            B6(**json.loads(arguments))
+            # A multi-URL scrape runs its own event loop; keep it off the server's loop
+            await run_in_threadpool(B6, **json.loads(arguments))
         if "B7" == task_code:
             B7(**json.loads(arguments))
         if "B9" == task_code:
@@ -487,6 +639,9 @@ async def run_task(task: str):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# B10: CSV filtering endpoint
+B10(app)
+
 # Placeholder for file reading
 @app.get("/read", response_class=PlainTextResponse)
 async def read_file(path: str = Query(..., description="File path to read")):
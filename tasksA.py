@@ -4,10 +4,33 @@ from dateutil.parser import parse
 from datetime import datetime
 from fastapi import FastAPI, HTTPException
 import json
+import mmap
+import re
+import tempfile
+import textwrap
 from pathlib import Path
 import os
+import time
 import requests
-from scipy.spatial.distance import cosine
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from email.utils import parseaddr
+from itertools import repeat
+import bisect
+import ctypes
+import ctypes.util
+import hashlib
+import heapq
+import select
+import struct
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, the store is then single-process only
+    fcntl = None
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -36,89 +59,615 @@ def A2(prettier_version="prettier@3.4.2", filename="/data/format.md"):
     except subprocess.CalledProcessError as e:
         print(f"An error occurred: {e}")
 
-def A3(filename='/data/dates.txt', targetfile='/data/dates-wednesdays.txt', weekday=2):
+MONTHS = {name: i for i, name in enumerate(['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+
+# The shapes datagen.get_dates emits, as (pattern, (year, month, day) group numbers)
+DATE_PATTERNS = [
+    (re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})$'), (1, 2, 3)),                          # 2024-03-14
+    (re.compile(r'(\d{1,2})-([A-Za-z]{3})-(\d{4})$'), (3, 2, 1)),                       # 14-Mar-2024
+    (re.compile(r'([A-Za-z]{3}) (\d{1,2}), (\d{4})$'), (3, 1, 2)),                       # Mar 14, 2024
+    (re.compile(r'(\d{4})/(\d{1,2})/(\d{1,2}) \d{1,2}:\d{2}:\d{2}$'), (1, 2, 3)),          # 2024/03/14 15:30:45
+]
+
+def parse_ymd(line):
+    # Fast path for the known formats, dateutil for anything else
+    for pattern, (y, m, d) in DATE_PATTERNS:
+        match = pattern.match(line)
+        if match:
+            month = match.group(m)
+            month = int(month) if month.isdigit() else MONTHS.get(month.lower())
+            if month:
+                return int(match.group(y)), month, int(match.group(d))
+    date = parse(line)
+    return date.year, date.month, date.day
+
+def weekday_histogram(filename, vectorized=False):
+    """Count dates per weekday (Monday=0 .. Sunday=6) in one streaming pass over the file."""
+    if not vectorized:
+        histogram = [0] * 7
+        with open(filename, 'r') as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    histogram[datetime(*parse_ymd(line)).weekday()] += 1
+        return histogram
+
+    # Parse to (year, month, day) columns and let NumPy's datetime64 work out the weekdays
+    with open(filename, 'r') as file:
+        ymd = np.array([parse_ymd(line) for line in map(str.strip, file) if line], dtype=np.int64).reshape(-1, 3)
+    days = ((ymd[:, 0] - 1970).astype('datetime64[Y]') + (ymd[:, 1] - 1).astype('timedelta64[M]')).astype('datetime64[D]')
+    days = days + (ymd[:, 2] - 1).astype('timedelta64[D]')
+    # 1970-01-01 was a Thursday (weekday 3)
+    return np.bincount((days.astype(np.int64) + 3) % 7, minlength=7).tolist()
+
+_weekday_histograms = {}
+
+def cached_weekday_histogram(filename, vectorized=False):
+    # Reuse the histogram until the file changes, so each weekday question doesn't re-read it
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+    if key not in _weekday_histograms:
+        _weekday_histograms[key] = weekday_histogram(filename, vectorized=vectorized)
+    return _weekday_histograms[key]
+
+def A3(filename='/data/dates.txt', targetfile='/data/dates-wednesdays.txt', weekday=2, vectorized=False):
     input_file = filename
     output_file = targetfile
-    weekday = weekday
-    weekday_count = 0
+    weekday = int(weekday) - 1
 
-    with open(input_file, 'r') as file:
-        weekday_count = sum(1 for date in file if parse(date).weekday() == int(weekday)-1)
+    histogram = cached_weekday_histogram(input_file, vectorized=vectorized)
+    weekday_count = histogram[weekday] if 0 <= weekday < 7 else 0
 
 
     with open(output_file, 'w') as file:
         file.write(str(weekday_count))
 
-def A4(filename="/data/contacts.json", targetfile="/data/contacts-sorted.json"):
-    # Load the contacts from the JSON file
-    with open(filename, 'r') as file:
-        contacts = json.load(file)
+def contact_key(contact):
+    return (contact['last_name'], contact['first_name'])
+
+def iter_json_array(file, chunk_size=1 << 20):
+    # Yield the items of a top-level JSON array without loading the whole document
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+    started = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,' or (not started and buffer[pos:pos + 1] == '['):
+            started = started or buffer[pos] == '['
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            fill()
+            continue
+        if buffer[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if not eof and (end == len(buffer) or buffer[end] in '.eE+-0123456789'):
+            # A number split across chunks decodes as a shorter one, decode it again with more input
+            fill()
+            continue
+        pos = end
+        yield item
+
+def write_sorted_runs(items, run_dir, run_bytes):
+    # Sort chunks of roughly run_bytes of JSON text each and spill them as JSON lines files
+    runs, run, size = [], [], 0
+
+    def spill():
+        path = os.path.join(run_dir, f"run-{len(runs)}.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            for item in sorted(run, key=contact_key):
+                f.write(json.dumps(item) + '\n')
+        runs.append(path)
+
+    for item in items:
+        run.append(item)
+        size += len(json.dumps(item))
+        if size >= run_bytes:
+            spill()
+            run, size = [], 0
+    if run:
+        spill()
+    return runs
+
+def read_run(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+def merge_runs(runs, run_dir, fan_in=128):
+    # Merge in passes so we never hold more than fan_in run files open; heapq.merge keeps equal keys in run order
+    while len(runs) > fan_in:
+        merged = []
+        for i in range(0, len(runs), fan_in):
+            path = os.path.join(run_dir, f"merge-{len(runs)}-{i}.jsonl")
+            with open(path, 'w', encoding='utf-8') as f:
+                for item in heapq.merge(*(read_run(run) for run in runs[i:i + fan_in]), key=contact_key):
+                    f.write(json.dumps(item) + '\n')
+            merged.append(path)
+        runs = merged
+    return heapq.merge(*(read_run(run) for run in runs), key=contact_key)
+
+def write_json_array(items, file):
+    # Same bytes as json.dump(list(items), file, indent=4), one item at a time
+    first = True
+    for item in items:
+        file.write('[\n' if first else ',\n')
+        file.write(textwrap.indent(json.dumps(item, indent=4), '    '))
+        first = False
+    file.write('[]' if first else '\n]')
+
+def A4(filename="/data/contacts.json", targetfile="/data/contacts-sorted.json", memory_budget=256 * 1024 ** 2, streaming=None):
+    # Small files are sorted in memory; larger ones (or streaming=True) use an external merge sort
+    if streaming is None:
+        streaming = os.path.getsize(filename) * 8 > memory_budget
+
+    if not streaming:
+        # Load the contacts from the JSON file
+        with open(filename, 'r') as file:
+            contacts = json.load(file)
+
+        # Sort the contacts by last_name and then by first_name
+        sorted_contacts = sorted(contacts, key=contact_key)
+
+        # Write the sorted contacts to the new JSON file
+        with open(targetfile, 'w') as file:
+            json.dump(sorted_contacts, file, indent=4)
+        return
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(targetfile))) as run_dir:
+        with open(filename, 'r') as file:
+            # Parsed objects take several times their JSON size, keep each run well under the budget
+            runs = write_sorted_runs(iter_json_array(file), run_dir, max(1, memory_budget // 8))
+        with open(targetfile, 'w') as file:
+            write_json_array(merge_runs(runs, run_dir), file)
+
+def read_first_line(path, max_chars=64 * 1024):
+    # Only read a bounded prefix, so one huge single-line log can't blow up memory
+    with open(path, 'r') as f_in:
+        return f_in.readline(max_chars).strip()
+
+def recent_log_files(log_dir_path, num_files):
+    # One scandir pass; DirEntry.stat() is cached and nlargest keeps a heap of num_files entries
+    with os.scandir(log_dir_path) as entries:
+        logs = (entry for entry in entries if entry.name.endswith('.log') and entry.is_file())
+        newest = heapq.nlargest(int(num_files), logs, key=lambda entry: entry.stat().st_mtime)
+    return [entry.path for entry in newest]
+
+# inotify(7) flags
+IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x2, 0x4, 0x8
+IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x40, 0x80, 0x100, 0x200
+IN_DELETE_SELF, IN_MOVE_SELF, IN_Q_OVERFLOW = 0x400, 0x800, 0x4000
+IN_NONBLOCK, IN_CLOEXEC = 0o4000, 0o2000000
+INOTIFY_EVENT = struct.Struct('iIII')
+
+class RecentLogsIndex(threading.Thread):
+    """Background watcher keeping *.log files of one directory ordered by mtime.
+
+    Uses Linux inotify when available and falls back to rescanning every poll_interval
+    seconds, also while the directory is deleted or moved away (watching again once it is
+    recreated). First lines are read lazily and cached until the file changes.
+    """
+
+    def __init__(self, log_dir_path, poll_interval=1.0, use_inotify=True):
+        super().__init__(daemon=True, name=f"log-index:{log_dir_path}")
+        self.log_dir = os.path.abspath(log_dir_path)
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.mode = None
+        self._files = {}   # path -> [mtime_ns, first line or None]
+        self._order = []   # sorted (mtime_ns, path)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._fd = None
+        self._rewatch = False  # set after the watched directory disappears
 
-    # Sort the contacts by last_name and then by first_name
-    sorted_contacts = sorted(contacts, key=lambda x: (x['last_name'], x['first_name']))
+    def _set(self, path, mtime_ns):
+        entry = self._files.get(path)
+        if entry is not None:
+            if entry[0] == mtime_ns:
+                return
+            del self._order[bisect.bisect_left(self._order, (entry[0], path))]
+        self._files[path] = [mtime_ns, None]
+        bisect.insort(self._order, (mtime_ns, path))
 
-    # Write the sorted contacts to the new JSON file
-    with open(targetfile, 'w') as file:
-        json.dump(sorted_contacts, file, indent=4)
+    def _remove(self, path):
+        entry = self._files.pop(path, None)
+        if entry is not None:
+            del self._order[bisect.bisect_left(self._order, (entry[0], path))]
 
-def A5(log_dir_path='/data/logs', output_file_path='/data/logs-recent.txt', num_files=10):
-    log_dir = Path(log_dir_path)
+    def _scan(self):
+        try:
+            with os.scandir(self.log_dir) as entries:
+                return {entry.path: entry.stat().st_mtime_ns for entry in entries
+                        if entry.name.endswith('.log') and entry.is_file()}
+        except FileNotFoundError:
+            # Deleted or moved away; empty until it is recreated
+            return {}
+
+    def rescan(self):
+        current = self._scan()
+        with self._lock:
+            for path in set(self._files) - set(current):
+                self._remove(path)
+            for path, mtime_ns in current.items():
+                self._set(path, mtime_ns)
+
+    def refresh(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            stat = None
+        with self._lock:
+            if stat is None or not os.path.isfile(path):
+                self._remove(path)
+            else:
+                self._set(path, stat.st_mtime_ns)
+
+    def recent(self, num_files):
+        # (path, first line) of the num_files newest logs, most recent first
+        result, skip = [], 0
+        while len(result) < int(num_files or 0):
+            with self._lock:
+                stop = len(self._order) - skip
+                window = self._order[max(0, stop - (int(num_files) - len(result))):stop]
+                newest = [(path, mtime_ns, self._files[path][1]) for mtime_ns, path in reversed(window)]
+            if not newest:
+                break
+            skip += len(newest)
+            for path, mtime_ns, first_line in newest:
+                if first_line is None:
+                    try:
+                        first_line = read_first_line(path)
+                    except FileNotFoundError:
+                        # Deleted since it was indexed; the watcher will drop it
+                        continue
+                    with self._lock:
+                        entry = self._files.get(path)
+                        if entry is not None and entry[0] == mtime_ns:
+                            entry[1] = first_line
+                result.append((path, first_line))
+        return result
+
+    def check_consistency(self, num_files=None):
+        # Compare the in-memory index with a full rescan; True if they agree
+        expected = self._scan()
+        with self._lock:
+            indexed = {path: entry[0] for path, entry in self._files.items()}
+            order = list(self._order)
+        if num_files is None:
+            return indexed == expected
+        newest = sorted(((mtime_ns, path) for path, mtime_ns in expected.items()), reverse=True)[:int(num_files)]
+        return newest == order[::-1][:int(num_files)]
+
+    def _open_inotify(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+                | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+        if libc.inotify_add_watch(fd, os.fsencode(self.log_dir), mask) < 0:
+            os.close(fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+        return fd
+
+    def start(self):
+        if self.use_inotify and sys.platform.startswith('linux'):
+            try:
+                self._fd = self._open_inotify()
+                self.mode = 'inotify'
+            except (OSError, AttributeError):
+                self._fd = None
+        self.mode = self.mode or 'polling'
+        # Watch first, then scan, so changes made during the initial scan aren't lost
+        self.rescan()
+        super().start()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            if self._fd is None:
+                self._poll()
+            else:
+                self._watch()
+
+    def _poll(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self.rescan()
+            if self._rewatch and os.path.isdir(self.log_dir):
+                # The directory is back after being deleted or moved: watch the new one
+                try:
+                    self._fd = self._open_inotify()
+                except OSError:
+                    continue
+                self.mode, self._rewatch = 'inotify', False
+                self.rescan()
+                return
+
+    def _watch(self):
+        try:
+            while not self._stop_event.is_set():
+                if not select.select([self._fd], [], [], self.poll_interval)[0]:
+                    continue
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                offset = 0
+                while offset < len(data):
+                    _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                    name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b'\0')
+                    offset += INOTIFY_EVENT.size + length
+                    if mask & IN_Q_OVERFLOW:
+                        self.rescan()
+                    elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                        # The watch is gone with the directory; poll until it exists again
+                        self.mode, self._rewatch = 'polling', True
+                        self.rescan()
+                        return
+                    elif name.endswith(b'.log'):
+                        self.refresh(os.path.join(self.log_dir, os.fsdecode(name)))
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+log_indexes = {}
+
+def start_log_index(log_dir_path='/data/logs', poll_interval=1.0, use_inotify=True):
+    # Start (once) a background index that A5 will answer from for this directory
+    key = os.path.abspath(log_dir_path)
+    index = log_indexes.get(key)
+    if index is None or not index.is_alive():
+        index = log_indexes[key] = RecentLogsIndex(log_dir_path, poll_interval=poll_interval, use_inotify=use_inotify)
+        index.start()
+    return index
+
+def stop_log_indexes():
+    for index in log_indexes.values():
+        index.stop()
+    log_indexes.clear()
+
+def A5(log_dir_path='/data/logs', output_file_path='/data/logs-recent.txt', num_files=10, max_workers=8):
     output_file = Path(output_file_path)
 
-    # Get list of .log files sorted by modification time (most recent first)
-    log_files = sorted(log_dir.glob('*.log'), key=os.path.getmtime, reverse=True)[:num_files]
+    index = log_indexes.get(os.path.abspath(log_dir_path))
+    if index is not None and index.is_alive():
+        # A live index answers from memory without touching the directory
+        first_lines = [first_line for _, first_line in index.recent(num_files)]
+    else:
+        # Get the .log files with the latest modification time (most recent first)
+        log_files = recent_log_files(log_dir_path, num_files)
 
-    # Read first line of each file and write to the output file
+        # Read first line of each file and write to the output file
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(log_files)))) as executor:
+            first_lines = list(executor.map(read_first_line, log_files))
     with output_file.open('w') as f_out:
-        for log_file in log_files:
-            with log_file.open('r') as f_in:
-                first_line = f_in.readline().strip()
-                f_out.write(f"{first_line}\n")
+        for first_line in first_lines:
+            f_out.write(f"{first_line}\n")
+
+# First line starting with '# ', at the start of the file or after any newline (like text-mode line splitting)
+H1_PATTERN = re.compile(rb'(?:^|[\r\n])# ([^\r\n]*)')
 
-def A6(doc_dir_path='/data/docs', output_file_path='/data/docs/index.json'):
+def find_h1(file_path, mmap_threshold=64 * 1024):
+    # Byte-level search for the first H1; small files are read whole, larger ones memory-mapped
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < mmap_threshold:
+            match = H1_PATTERN.search(f.read())
+            title = match and match.group(1)
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                match = H1_PATTERN.search(data)
+                title = match and match.group(1)
+    # Extract the title text after '# '
+    return title.decode('utf-8').strip() if match else None
+
+def scan_docs_dir(path):
+    # One level of os.walk: (subdirectories to descend into, .md files with their (size, mtime_ns, inode)), in scandir order
+    subdirs, md_files = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if not entry.is_symlink():
+                        subdirs.append(entry.path)
+                elif entry.name.endswith('.md'):
+                    try:
+                        stat = entry.stat()
+                        state = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+                    except OSError:
+                        state = None
+                    md_files.append((entry.path, state))
+    except OSError:
+        pass
+    return subdirs, md_files
+
+def load_docs_manifest(manifest_path, docs_dir):
+    # {relative path: [size, mtime_ns, inode, title]} from the last run, if it was for the same directory
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('doc_dir') != os.path.abspath(docs_dir):
+        return {}
+    return manifest.get('files', {})
+
+def A6(doc_dir_path='/data/docs', output_file_path='/data/docs/index.json', max_workers=16, incremental=True, manifest_path=None):
     docs_dir = doc_dir_path
     output_file = output_file_path
     index_data = {}
 
-    # Walk through all files in the docs directory
-    for root, _, files in os.walk(docs_dir):
-        for file in files:
-            if file.endswith('.md'):
-                # print(file)
-                file_path = os.path.join(root, file)
-                # Read the file and find the first occurrence of an H1
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        if line.startswith('# '):
-                            # Extract the title text after '# '
-                            title = line[2:].strip()
-                            # Get the relative path without the prefix
-                            relative_path = os.path.relpath(file_path, docs_dir).replace('\\', '/')
-                            index_data[relative_path] = title
-                            break  # Stop after the first H1
+    # Titles of files unchanged since the last run come from the sidecar manifest instead of being re-read
+    manifest_path = manifest_path or f"{output_file}.manifest.json"
+    previous = load_docs_manifest(manifest_path, docs_dir) if incremental else {}
+    manifest = {}
+
+    # Walk the docs directory and search new or changed files for their H1 on a worker pool
+    scans, titles = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pending = {executor.submit(scan_docs_dir, docs_dir): docs_dir}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                subdirs, md_files = scans[pending.pop(future)] = future.result()
+                for file_path, state in md_files:
+                    # Get the relative path without the prefix
+                    relative_path = os.path.relpath(file_path, docs_dir).replace('\\', '/')
+                    known = previous.get(relative_path)
+                    if state is not None and known is not None and known[:3] == state:
+                        titles[file_path] = known[3]
+                    else:
+                        titles[file_path] = executor.submit(find_h1, file_path)
+                for subdir in subdirs:
+                    pending[executor.submit(scan_docs_dir, subdir)] = subdir
+
+        # Assemble the index in the same order os.walk would have produced it
+        stack = [docs_dir]
+        while stack:
+            subdirs, md_files = scans[stack.pop()]
+            for file_path, state in md_files:
+                title = titles[file_path]
+                if not isinstance(title, str) and title is not None:
+                    title = title.result()
+                relative_path = os.path.relpath(file_path, docs_dir).replace('\\', '/')
+                if state is not None:
+                    manifest[relative_path] = state + [title]
+                if title is not None:
+                    index_data[relative_path] = title
+            stack.extend(reversed(subdirs))
+
     # Write the index data to index.json
-    # print(index_data)
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(index_data, f, indent=4)
 
-def A7(filename='/data/email.txt', output_file='/data/email-sender.txt'):
-    # Read the content of the email
-    with open(filename, 'r') as file:
-        email_content = file.readlines()
+    if incremental:
+        # Replace the manifest atomically so an interrupted run can't leave it half-written
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'doc_dir': os.path.abspath(docs_dir), 'files': manifest}, f)
+        os.replace(tmp_path, manifest_path)
 
-    sender_email = "sujay@gmail.com"
-    for line in email_content:
-        if "From" == line[:4]:
-            sender_email = (line.strip().split(" ")[-1]).replace("<", "").replace(">", "")
+def parse_headers(file, max_bytes=256 * 1024):
+    # Read header lines up to the first blank line (never the body), unfolding continuation lines
+    headers, total = [], 0
+    while total < max_bytes:
+        line = file.readline(max_bytes - total)
+        if not line:
             break
+        total += len(line)
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', 'replace')
+        line = line.rstrip('\r\n')
+        if not line:
+            break
+        if line[0] in ' \t':
+            # RFC 5322 folding: a line starting with whitespace continues the previous header
+            if headers:
+                headers[-1][1] += line
+        elif ':' in line:
+            name, value = line.split(':', 1)
+            headers.append([name.strip(), value])
+    return headers
+
+def sender_from_headers(headers):
+    for name, value in headers:
+        if name.lower() == 'from':
+            address = parseaddr(value.strip())[1]
+            return address or value.strip().split(" ")[-1].replace("<", "").replace(">", "")
+    return None
+
+def sender_from_file(filename):
+    with open(filename, 'rb') as file:
+        return sender_from_headers(parse_headers(file))
+
+def senders_from_files(paths):
+    return [(path, sender_from_file(path)) for path in paths]
+
+def senders_from_mbox_range(path, start, end):
+    # Senders of the mbox messages whose "From " separator line starts in [start, end)
+    results = []
+    with open(path, 'rb') as file:
+        if start:
+            # Skip to the first line that starts at or after `start`
+            file.seek(start - 1)
+            file.readline()
+        while True:
+            offset = file.tell()
+            line = file.readline()
+            if not line:
+                break
+            if line.startswith(b'From '):
+                if offset >= end:
+                    break
+                results.append((f"{path}#{offset}", sender_from_headers(parse_headers(file))))
+    return results
 
-    # Get the extracted email address
+def extract_senders(source, output_file, max_workers=None, chunk_size=256):
+    """Extract the sender of every message in a directory of emails or an mbox file.
+
+    Work is spread over a process pool; results go to output_file as JSON lines if it
+    ends in .jsonl, otherwise as "source<TAB>sender" lines.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        if os.path.isdir(source):
+            paths = sorted(os.path.join(root, name) for root, _, files in os.walk(source) for name in files)
+            chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+            results = executor.map(senders_from_files, chunks)
+        else:
+            # Split the mbox into byte ranges; each worker parses the messages starting in its range
+            size = os.path.getsize(source)
+            step = max(1024 * 1024, size // (4 * (max_workers or os.cpu_count() or 1)) + 1)
+            results = executor.map(senders_from_mbox_range, repeat(source), range(0, size, step),
+                                   range(step, size + step, step))
+
+        with open(output_file, 'w') as file:
+            for chunk in results:
+                for message, sender in chunk:
+                    if output_file.endswith('.jsonl'):
+                        file.write(json.dumps({"source": message, "sender": sender}) + '\n')
+                    else:
+                        file.write(f"{message}\t{sender or ''}\n")
+
+def A7(filename='/data/email.txt', output_file='/data/email-sender.txt', bulk=False, max_workers=None):
+    # A directory of messages, or an mbox with bulk=True, goes through the bulk extractor
+    if bulk or os.path.isdir(filename):
+        extract_senders(filename, output_file, max_workers=max_workers)
+        return
+
+    # Only the headers are read; the body and any attachments are never loaded
+    sender_email = sender_from_file(filename) or "sujay@gmail.com"
 
     # Write the email address to the output file
     with open(output_file, 'w') as file:
         file.write(sender_email)
 
 import base64
+import io
+from PIL import Image, ImageFilter
 def png_to_base64(image_path):
     with open(image_path, "rb") as image_file:
         base64_string = base64.b64encode(image_file.read()).decode('utf-8')
@@ -156,7 +705,65 @@ def png_to_base64(image_path):
 #     except Exception as e:
 #         print(f"❌ Error writing {output_file}: {e}")
 
-def A8(filename='/data/credit_card.txt', image_path='/data/credit_card.png'):
+IMAGE_MIME_TYPES = {'PNG': 'image/png', 'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+def text_band_box(image, threshold=40, padding=16):
+    # Bounding box of the high-contrast (edge) pixels, i.e. where the text is, plus some padding
+    edges = np.asarray(image.convert('L').filter(ImageFilter.FIND_EDGES))[1:-1, 1:-1] > threshold
+    rows, cols = np.flatnonzero(edges.any(axis=1)), np.flatnonzero(edges.any(axis=0))
+    if not len(rows):
+        return None
+    return (max(0, int(cols[0]) + 1 - padding), max(0, int(rows[0]) + 1 - padding),
+            min(image.width, int(cols[-1]) + 2 + padding), min(image.height, int(rows[-1]) + 2 + padding))
+
+def prepare_image(image_path, grayscale=True, crop_text=True, max_pixels=300_000, allow_lossy=False):
+    """Shrink an image before sending it to a vision model.
+
+    Optionally converts to grayscale, crops to the high-contrast text region and downscales
+    to at most max_pixels, then re-encodes as whichever format comes out smallest.
+    Returns (mime type, in-memory buffer).
+    """
+    image = Image.open(image_path)
+    image.load()
+    if grayscale:
+        image = image.convert('L')
+    elif image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    if crop_text:
+        box = text_band_box(image)
+        if box:
+            image = image.crop(box)
+    if image.width * image.height > max_pixels:
+        scale = (max_pixels / (image.width * image.height)) ** 0.5
+        image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.LANCZOS)
+
+    candidates = [('PNG', {'optimize': True}), ('WEBP', {'lossless': True})]
+    if allow_lossy:
+        candidates += [('JPEG', {'quality': 85}), ('WEBP', {'quality': 85})]
+    best = None
+    for fmt, options in candidates:
+        buffer = io.BytesIO()
+        try:
+            image.save(buffer, fmt, **options)
+        except (KeyError, OSError):
+            # Pillow built without this encoder
+            continue
+        if best is None or buffer.tell() < best[1].tell():
+            best = (IMAGE_MIME_TYPES[fmt], buffer)
+    return best
+
+def buffer_to_base64(buffer):
+    # Encode straight from the BytesIO's memory, without copying it out with getvalue()
+    with buffer.getbuffer() as view:
+        return base64.b64encode(view).decode('ascii')
+
+def A8(filename='/data/credit_card.txt', image_path='/data/credit_card.png', grayscale=True, crop_text=True,
+       max_pixels=300_000, allow_lossy=False):
+    mime_type, buffer = prepare_image(image_path, grayscale=grayscale, crop_text=crop_text, max_pixels=max_pixels,
+                                      allow_lossy=allow_lossy)
+    original_size = os.path.getsize(image_path)
+    print(f"A8 image payload: {buffer.tell()} bytes ({mime_type}), saved {original_size - buffer.tell()} of {original_size} bytes")
+
     # Construct the request body for the AIProxy call
     body = {
         "model": "gpt-4o-mini",
@@ -171,7 +778,7 @@ def A8(filename='/data/credit_card.txt', image_path='/data/credit_card.png'):
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/png;base64,{png_to_base64(image_path)}"
+                            "url": f"data:{mime_type};base64,{buffer_to_base64(buffer)}"
                         }
                     }
                 ]
@@ -201,51 +808,432 @@ def A8(filename='/data/credit_card.txt', image_path='/data/credit_card.png'):
 
 
 
-def get_embedding(text):
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_URL = "http://aiproxy.sanand.workers.dev/openai/v1/embeddings"
+embedding_session = requests.Session()
+
+def embed_batch(texts, retries=3, backoff=1.0):
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {AIPROXY_TOKEN}"
     }
     data = {
-        "model": "text-embedding-3-small",
-        "input": [text]
+        "model": EMBEDDING_MODEL,
+        "input": list(texts)
+    }
+    for attempt in range(retries + 1):
+        try:
+            response = embedding_session.post(EMBEDDING_URL, headers=headers, data=json.dumps(data))
+            response.raise_for_status()
+            # The API tags each embedding with its input index, don't rely on response order
+            items = sorted(response.json()["data"], key=lambda item: item["index"])
+            return [item["embedding"] for item in items]
+        except requests.RequestException:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+class EmbeddingStore:
+    """Content-addressed embedding cache on disk, keyed by (model, sha256 of text).
+
+    Vectors for each model are appended to a raw float32 file that is read back through
+    np.memmap; an SQLite index maps each text hash to its row in that file. Writers take a
+    file lock, so several processes can share one store.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.directory / "index.db", check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, dim INTEGER)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (model TEXT, digest TEXT, row INTEGER, PRIMARY KEY (model, digest))")
+        self._db.commit()
+
+    @staticmethod
+    def digest(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def _vectors_path(self, model):
+        return self.directory / f"{hashlib.sha256(model.encode()).hexdigest()[:16]}.f32"
+
+    @contextmanager
+    def _write_lock(self):
+        # Threads of this process, then other processes (flock on a lock file next to the index)
+        with self._lock, open(self.directory / "index.lock", 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _dim(self, model):
+        row = self._db.execute("SELECT dim FROM models WHERE model = ?", (model,)).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, model, texts):
+        # One entry per text: the stored vector, or None if it hasn't been embedded yet
+        with self._lock:
+            dim = self._dim(model)
+            if dim is None:
+                return [None] * len(texts)
+            digests = [self.digest(text) for text in texts]
+            rows = {}
+            unique = list(set(digests))
+            for i in range(0, len(unique), 500):
+                chunk = unique[i:i + 500]
+                query = f"SELECT digest, row FROM embeddings WHERE model = ? AND digest IN ({','.join('?' * len(chunk))})"
+                rows.update(self._db.execute(query, (model, *chunk)).fetchall())
+            if not rows:
+                return [None] * len(texts)
+            path = self._vectors_path(model)
+            vectors = np.memmap(path, dtype=np.float32, mode='r', shape=(path.stat().st_size // (4 * dim), dim))
+            return [np.array(vectors[rows[d]]) if d in rows else None for d in digests]
+
+    def put_many(self, model, texts, embeddings):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if not len(matrix):
+            return
+        with self._write_lock():
+            dim = self._dim(model)
+            if dim is None:
+                dim = matrix.shape[1]
+                self._db.execute("INSERT INTO models VALUES (?, ?)", (model, dim))
+            elif dim != matrix.shape[1]:
+                raise ValueError(f"{model} embeddings have {dim} dimensions, got {matrix.shape[1]}")
+            path = self._vectors_path(model)
+            # The next row comes from the index, not the file size: anything past the last indexed
+            # row (a torn or unindexed append) is overwritten, so rows always stay aligned
+            last = self._db.execute("SELECT MAX(row) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+            start = 0 if last is None else last + 1
+            # Write the vectors before indexing them, so the index never points past the end of the file
+            with open(path, 'r+b' if path.exists() else 'w+b') as f:
+                f.truncate(start * 4 * dim)
+                f.seek(start * 4 * dim)
+                f.write(matrix.tobytes())
+            self._db.executemany(
+                "INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?)",
+                [(model, self.digest(text), start + i) for i, text in enumerate(texts)],
+            )
+            self._db.commit()
+
+_embedding_store = None
+
+def get_embedding_store():
+    # Shared store under EMBEDDING_STORE_DIR; set it to an empty string to disable the cache
+    global _embedding_store
+    directory = os.getenv('EMBEDDING_STORE_DIR', os.path.expanduser('~/.cache/embeddings'))
+    if not directory:
+        return None
+    if _embedding_store is None or _embedding_store.directory != Path(directory):
+        _embedding_store = EmbeddingStore(directory)
+    return _embedding_store
+
+def fetch_embeddings(texts, batch_size=100, max_workers=4, retries=3):
+    # Send the texts in batches, several batches in flight at once; results keep the input order
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = executor.map(lambda batch: embed_batch(batch, retries=retries), batches)
+        return [embedding for batch in results for embedding in batch]
+
+def get_embeddings(texts, batch_size=100, max_workers=4, retries=3, store=None):
+    # Serve what we can from the embedding store and only call the API for texts it hasn't seen
+    store = store if store is not None else get_embedding_store()
+    if store is None:
+        return fetch_embeddings(texts, batch_size=batch_size, max_workers=max_workers, retries=retries)
+
+    embeddings = store.get_many(EMBEDDING_MODEL, texts)
+    missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+    if missing:
+        fetched = dict(zip(missing, fetch_embeddings(missing, batch_size=batch_size, max_workers=max_workers, retries=retries)))
+        store.put_many(EMBEDDING_MODEL, missing, [fetched[text] for text in missing])
+        embeddings = [fetched[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+    return embeddings
+
+def get_embedding(text):
+    return get_embeddings([text], max_workers=1)[0]
+
+def normalize_embeddings(embeddings):
+    # Unit-length float32 rows, so a dot product is the cosine similarity
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def tile_size(n, memory_budget, cell_bytes=13):
+    # Per tile cell: the float32 similarity (4 bytes) plus the larger of the argpartition int64
+    # index (8) and, for threshold-only search, the boolean mask and match index (1 + 8)
+    return max(1, min(n, int((memory_budget / cell_bytes) ** 0.5)))
+
+def similar_pairs(matrix, top_k=1, threshold=None, memory_budget=256 * 1024 ** 2):
+    """Return (similarity, i, j) pairs with i < j, most similar first.
+
+    Similarities are computed in blocked matrix multiplies so peak memory stays within
+    memory_budget. top_k keeps only the k best pairs, threshold keeps only pairs at or
+    above that similarity; pass top_k=None with a threshold to get every pair above it.
+    """
+    n = len(matrix)
+    tile = tile_size(n, memory_budget, cell_bytes=matrix.dtype.itemsize + 9)
+    best = []  # min-heap of the top_k pairs seen so far
+    matches = []
+    for i0 in range(0, n, tile):
+        rows = matrix[i0:i0 + tile]
+        for j0 in range(i0, n, tile):
+            sims = rows @ matrix[j0:j0 + tile].T
+            if i0 == j0:
+                # Diagonal tile: only keep pairs above the diagonal (row by row, no index arrays)
+                for r in range(len(rows)):
+                    sims[r, :r + 1] = -np.inf
+            flat = sims.ravel()
+            if top_k is None:
+                candidates = np.flatnonzero(flat >= threshold)
+            elif top_k < flat.size:
+                candidates = np.argpartition(flat, -top_k)[-top_k:]
+            else:
+                candidates = np.arange(flat.size)
+            for idx in candidates:
+                similarity = float(flat[idx])
+                if similarity == -np.inf or (threshold is not None and similarity < threshold):
+                    continue
+                r, c = divmod(int(idx), sims.shape[1])
+                pair = (similarity, i0 + r, j0 + c)
+                if top_k is None:
+                    matches.append(pair)
+                elif len(best) < top_k:
+                    heapq.heappush(best, pair)
+                elif pair > best[0]:
+                    heapq.heapreplace(best, pair)
+            # Free this tile (candidates can be a view of the full argpartition index) before the next matmul
+            del sims, flat, candidates
+    return sorted(matches if top_k is None else best, key=lambda p: (-p[0], p[1], p[2]))
+
+def lsh_similar_pairs(matrix, top_k=1, threshold=None, n_tables=8, n_bits=None, bucket_size=64, seed=0,
+                      memory_budget=256 * 1024 ** 2):
+    """Approximate similar_pairs using random-hyperplane LSH.
+
+    Each of n_tables hashes every row to an n_bits sign pattern, and only rows sharing a
+    bucket are compared exactly. More tables raise recall, more bits make buckets smaller
+    and faster to search; n_bits defaults to about log2(n / bucket_size).
+    """
+    n, dim = matrix.shape
+    if n_bits is None:
+        n_bits = int(np.ceil(np.log2(max(2, n / bucket_size))))
+    n_bits = max(1, min(62, n_bits))
+    rng = np.random.default_rng(seed)
+    weights = np.int64(1) << np.arange(n_bits, dtype=np.int64)
+    found = {}
+    for _ in range(n_tables):
+        planes = rng.standard_normal((dim, n_bits)).astype(np.float32)
+        codes = ((matrix @ planes) > 0) @ weights
+        # Stable sort keeps row indices increasing inside each bucket, so pairs stay (i < j)
+        order = np.argsort(codes, kind='stable')
+        for bucket in np.split(order, np.flatnonzero(np.diff(codes[order])) + 1):
+            if len(bucket) < 2:
+                continue
+            for similarity, a, b in similar_pairs(matrix[bucket], top_k=top_k, threshold=threshold, memory_budget=memory_budget):
+                found[(int(bucket[a]), int(bucket[b]))] = similarity
+    pairs = sorted(((similarity, i, j) for (i, j), similarity in found.items()), key=lambda p: (-p[0], p[1], p[2]))
+    return pairs if top_k is None else pairs[:top_k]
+
+def benchmark_ann(matrix, top_k=10, threshold=None, **lsh_params):
+    # Compare lsh_similar_pairs with the exact search: recall of the exact pairs and the speed-up
+    start = time.perf_counter()
+    exact = similar_pairs(matrix, top_k=top_k, threshold=threshold)
+    exact_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    approx = lsh_similar_pairs(matrix, top_k=top_k, threshold=threshold, **lsh_params)
+    approx_seconds = time.perf_counter() - start
+    expected = {(i, j) for _, i, j in exact}
+    recall = len(expected & {(i, j) for _, i, j in approx}) / len(expected) if expected else 1.0
+    return {
+        "n": len(matrix),
+        "pairs": len(expected),
+        "recall": recall,
+        "exact_seconds": exact_seconds,
+        "approx_seconds": approx_seconds,
+        "speedup": exact_seconds / approx_seconds if approx_seconds else float('inf'),
     }
-    response = requests.post("http://aiproxy.sanand.workers.dev/openai/v1/embeddings", headers=headers, data=json.dumps(data))
-    response.raise_for_status()
-    return response.json()["data"][0]["embedding"]
 
-def A9(filename='/data/comments.txt', output_filename='/data/comments-similar.txt'):
+def A9(filename='/data/comments.txt', output_filename='/data/comments-similar.txt', batch_size=100, max_workers=4,
+       top_k=1, threshold=None, memory_budget=256 * 1024 ** 2, method='exact', n_tables=8, n_bits=None):
     # Read comments
     with open(filename, 'r') as f:
         comments = [line.strip() for line in f.readlines()]
 
     # Get embeddings for all comments
-    embeddings = [get_embedding(comment) for comment in comments]
+    embeddings = get_embeddings(comments, batch_size=batch_size, max_workers=max_workers)
 
-    # Find the most similar pair
-    min_distance = float('inf')
-    most_similar = (None, None)
+    # Find the most similar pair(s)
+    matrix = normalize_embeddings(embeddings)
+    if method == 'lsh':
+        pairs = lsh_similar_pairs(matrix, top_k=top_k, threshold=threshold, n_tables=n_tables, n_bits=n_bits,
+                                  memory_budget=memory_budget)
+    else:
+        pairs = similar_pairs(matrix, top_k=top_k, threshold=threshold, memory_budget=memory_budget)
 
-    for i in range(len(comments)):
-        for j in range(i + 1, len(comments)):
-            distance = cosine(embeddings[i], embeddings[j])
-            if distance < min_distance:
-                min_distance = distance
-                most_similar = (comments[i], comments[j])
-
-    # Write the most similar pair to file
     with open(output_filename, 'w') as f:
-        f.write(most_similar[0] + '\n')
-        f.write(most_similar[1] + '\n')
+        if top_k == 1 and threshold is None:
+            # Write the most similar pair to file, one comment per line
+            _, i, j = pairs[0]
+            f.write(comments[i] + '\n')
+            f.write(comments[j] + '\n')
+        else:
+            # Several pairs: one tab-separated "similarity, comment, comment" line per pair
+            for similarity, i, j in pairs:
+                f.write(f"{similarity:.6f}\t{comments[i]}\t{comments[j]}\n")
 
-def A10(filename='/data/ticket-sales.db', output_filename='/data/ticket-sales-gold.txt', query="SELECT SUM(units * price) FROM tickets WHERE type = 'Gold'"):
-    # Connect to the SQLite database
-    conn = sqlite3.connect(filename)
-    cursor = conn.cursor()
+class SQLitePool:
+    """Read-only SQLite connections kept open per database file and reused across queries."""
+
+    PRAGMAS = (
+        "PRAGMA query_only = ON",
+        "PRAGMA mmap_size = 268435456",
+        "PRAGMA cache_size = -65536",
+        "PRAGMA temp_store = MEMORY",
+    )
+
+    def __init__(self, max_connections=4):
+        self.max_connections = max_connections
+        self._pools = {}  # realpath -> ((st_dev, st_ino), [idle connections])
+        self._lock = threading.Lock()
+
+    def _connect(self, path):
+        # Autocommit: no implicit BEGIN, so an idle pooled connection never holds a lock or an old snapshot
+        conn = sqlite3.connect(f"{Path(path).as_uri()}?mode=ro", uri=True, check_same_thread=False,
+                               isolation_level=None)
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self, db_path):
+        path = os.path.realpath(db_path)
+        stat = os.stat(path)
+        identity = (stat.st_dev, stat.st_ino)
+        with self._lock:
+            pool = self._pools.get(path)
+            if pool is not None and pool[0] != identity:
+                # The file was replaced, the old connections still point at the previous one
+                for conn in pool[1]:
+                    conn.close()
+                pool = None
+            if pool is None:
+                pool = self._pools[path] = (identity, [])
+            if pool[1]:
+                return path, identity, pool[1].pop()
+        return path, identity, self._connect(path)
+
+    def release(self, path, identity, conn):
+        if conn.in_transaction:
+            # e.g. an explicit BEGIN from the query itself
+            conn.rollback()
+        with self._lock:
+            pool = self._pools.get(path)
+            if pool is not None and pool[0] == identity and len(pool[1]) < self.max_connections:
+                pool[1].append(conn)
+                return
+        conn.close()
 
-    # Calculate the total sales for the "Gold" ticket type
-    cursor.execute(query)
-    total_sales = cursor.fetchone()[0]
+    @contextmanager
+    def connection(self, db_path):
+        path, identity, conn = self.acquire(db_path)
+        try:
+            yield conn
+        except BaseException:
+            # Don't return a connection to the pool in an unknown state
+            conn.close()
+            raise
+        else:
+            self.release(path, identity, conn)
+
+    def close(self):
+        with self._lock:
+            for _, idle in self._pools.values():
+                for conn in idle:
+                    conn.close()
+            self._pools.clear()
+
+sqlite_pool = SQLitePool()
+query_cache = OrderedDict()
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_MAX_ROWS = 10_000
+query_cache_lock = threading.Lock()
+
+def db_state(path):
+    # Anything that changes when the database's content can change: the file and its WAL
+    stat = os.stat(path)
+    try:
+        wal = os.stat(f"{path}-wal")
+        wal_state = (wal.st_mtime_ns, wal.st_size)
+    except FileNotFoundError:
+        wal_state = None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size, wal_state
+
+@contextmanager
+def open_query(db_path, query, chunk_size=10_000, use_cache=True):
+    """Run a query on a SQLite file and yield (column names, iterator of row chunks).
+
+    Reads go through the read-only pool and are fetched chunk_size rows at a time; results
+    of up to QUERY_CACHE_MAX_ROWS rows are cached until the database changes. Statements
+    that write fall back to a normal read-write connection and are never cached.
+    """
+    path = os.path.realpath(db_path)
+    key = (path, query, db_state(path))
+    if use_cache:
+        with query_cache_lock:
+            cached = query_cache.get(key)
+            if cached is not None:
+                query_cache.move_to_end(key)
+        if cached is not None:
+            columns, rows = cached
+            yield columns, iter([rows])
+            return
+
+    def chunks(cursor, columns):
+        cached = [] if use_cache else None
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if cached is not None:
+                cached.extend(rows)
+                if len(cached) > QUERY_CACHE_MAX_ROWS:
+                    cached = None
+            yield rows
+        if cached is not None:
+            with query_cache_lock:
+                query_cache[key] = (columns, cached)
+                while len(query_cache) > QUERY_CACHE_SIZE:
+                    query_cache.popitem(last=False)
+
+    with sqlite_pool.connection(path) as conn:
+        try:
+            cursor = conn.execute(query)
+        except sqlite3.OperationalError as e:
+            if 'readonly' not in str(e) and 'read-only' not in str(e):
+                raise
+            cursor = None
+        if cursor is not None:
+            columns = [column[0] for column in cursor.description or ()]
+            try:
+                yield columns, chunks(cursor, columns)
+            finally:
+                cursor.close()
+            return
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(query)
+        yield [column[0] for column in cursor.description or ()], iter(lambda: cursor.fetchmany(chunk_size), [])
+        conn.commit()
+    finally:
+        conn.close()
+
+def run_query(db_path, query, use_cache=True):
+    with open_query(db_path, query, use_cache=use_cache) as (_, chunks):
+        return [row for chunk in chunks for row in chunk]
+
+def A10(filename='/data/ticket-sales.db', output_filename='/data/ticket-sales-gold.txt', query="SELECT SUM(units * price) FROM tickets WHERE type = 'Gold'"):
+    # Calculate the total sales for the "Gold" ticket type on a pooled connection
+    rows = run_query(filename, query)
+    total_sales = rows[0][0] if rows else None
 
     # If there are no sales, set total_sales to 0
     total_sales = total_sales if total_sales else 0
@@ -253,6 +1241,3 @@ def A10(filename='/data/ticket-sales.db', output_filename='/data/ticket-sales-go
     # Write the total sales to the file
     with open(output_filename, 'w') as file:
         file.write(str(total_sales))
-
-    # Close the database connection
-    conn.close()
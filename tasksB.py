@@ -3,6 +3,7 @@
 # B1 & B2: Security Checks
 import os
 import subprocess
+from contextlib import contextmanager
 
 def B12(filepath):
     if filepath.startswith('/data'):
@@ -12,14 +13,264 @@ def B12(filepath):
     else:
         return False
 
+# Shared HTTP session for B3/B6 downloads, so repeated fetches reuse pooled connections
+_http_session = None
+HTTP_TIMEOUT = (10, 60)  # (connect, read) seconds
+HTTP_MAX_BYTES = int(os.getenv('HTTP_MAX_BYTES', str(1024 ** 3)))
+
+_new_file_mode = None
+
+def new_file_mode():
+    # What open() would give a new file under the current umask (mkstemp always uses 0600)
+    global _new_file_mode
+    if _new_file_mode is None:
+        umask = os.umask(0o022)
+        os.umask(umask)
+        _new_file_mode = 0o666 & ~umask
+    return _new_file_mode
+
+@contextmanager
+def atomic_output(save_path):
+    # Write through a temp file next to save_path, renamed into place only if the block succeeds
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(save_path)), prefix='.download-')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            yield file
+        os.chmod(tmp_path, new_file_mode())
+        os.replace(tmp_path, save_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+def http_session():
+    global _http_session
+    if _http_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        _http_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+        _http_session.mount('http://', adapter)
+        _http_session.mount('https://', adapter)
+    return _http_session
+
+class HTTPCache:
+    """On-disk cache of fetched URLs for conditional GETs, evicted least-recently-used past max_bytes.
+
+    Each URL keeps its body and a small JSON file with the ETag, Last-Modified and
+    Cache-Control headers it was served with. The total size is tracked as entries are
+    stored; the directory is only scanned once at first use and when that total passes max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=1024 ** 3):
+        import threading
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._total = None  # bytes in the cache, known after the first evict() pass
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        import hashlib
+        key = os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest())
+        return key + '.body', key + '.json'
+
+    def lookup(self, url):
+        import json
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path) as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return entry if os.path.exists(body_path) else None
+
+    @staticmethod
+    def directives(cache_control):
+        result = {}
+        for part in (cache_control or '').lower().split(','):
+            name, _, value = part.strip().partition('=')
+            if name:
+                result[name] = value.strip('"')
+        return result
+
+    def is_fresh(self, entry):
+        import time
+        directives = self.directives(entry.get('cache_control'))
+        if 'no-cache' in directives or 'max-age' not in directives:
+            return False
+        try:
+            return time.time() - entry['stored'] < int(directives['max-age'])
+        except ValueError:
+            return False
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def _write_meta(self, url, entry):
+        import json
+        _, meta_path = self._paths(url)
+        with open(meta_path + '.tmp', 'w') as file:
+            json.dump(entry, file)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def copy_to(self, url, entry, save_path):
+        # Serve the cached body into save_path (atomically) and mark the entry as recently used
+        import shutil, time
+        body_path, _ = self._paths(url)
+        with open(body_path, 'rb') as source, atomic_output(save_path) as file:
+            shutil.copyfileobj(source, file)
+        entry['accessed'] = time.time()
+        self._write_meta(url, entry)
+
+    def revalidated(self, url, entry, headers):
+        # A 304 may carry updated validators and freshness
+        import time
+        for header, field in (('ETag', 'etag'), ('Last-Modified', 'last_modified'), ('Cache-Control', 'cache_control')):
+            if headers.get(header):
+                entry[field] = headers[header]
+        entry['stored'] = time.time()
+        return entry
+
+    def store(self, url, source_path, headers):
+        import shutil, time
+        if 'no-store' in self.directives(headers.get('Cache-Control')):
+            return
+        if not headers.get('ETag') and not headers.get('Last-Modified') and 'max-age' not in self.directives(headers.get('Cache-Control')):
+            # Nothing to revalidate with and no freshness lifetime: caching wouldn't save a transfer
+            return
+        previous = self.lookup(url)
+        body_path, _ = self._paths(url)
+        shutil.copyfile(source_path, body_path + '.tmp')
+        os.replace(body_path + '.tmp', body_path)
+        now = time.time()
+        size = os.path.getsize(body_path)
+        self._write_meta(url, {
+            'url': url,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'cache_control': headers.get('Cache-Control'),
+            'stored': now,
+            'accessed': now,
+            'size': size,
+        })
+        with self._lock:
+            if self._total is not None:
+                self._total += size - (previous or {}).get('size', 0)
+            if self._total is None or self._total > self.max_bytes:
+                self._evict()
+
+    def evict(self):
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        # Full pass: read every entry, drop the least recently used and resync the total. Trimming to
+        # 90% of max_bytes leaves headroom, so a full cache isn't rescanned on every store.
+        import json
+        entries, total = [], 0
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                meta_path = os.path.join(self.directory, name)
+                try:
+                    with open(meta_path) as file:
+                        entry = json.load(file)
+                except (OSError, ValueError):
+                    continue
+                entries.append((entry.get('accessed', 0), entry.get('size', 0), meta_path))
+                total += entry.get('size', 0)
+        if total <= self.max_bytes:
+            entries = []
+        for _, size, meta_path in sorted(entries):
+            if total <= self.max_bytes * 0.9:
+                break
+            for path in (meta_path, meta_path[:-len('.json')] + '.body'):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+        self._total = total
+
+_http_cache = None
+
+def http_cache():
+    # Shared cache under HTTP_CACHE_DIR; set it to an empty string to disable caching
+    global _http_cache
+    directory = os.getenv('HTTP_CACHE_DIR', os.path.expanduser('~/.cache/http'))
+    if not directory:
+        return None
+    if _http_cache is None or _http_cache.directory != directory:
+        _http_cache = HTTPCache(directory, max_bytes=int(os.getenv('HTTP_CACHE_MAX_BYTES', str(1024 ** 3))))
+    return _http_cache
+
+def write_response(response, save_path, max_bytes, chunk_size):
+    # Stream the body to a temp file next to save_path and rename it into place; returns the size
+    length = response.headers.get('Content-Length')
+    if max_bytes and length and length.isdigit() and int(length) > max_bytes:
+        raise ValueError(f"{response.url} is {length} bytes, more than the {max_bytes} byte limit")
+    size = 0
+    with atomic_output(save_path) as file:
+        for chunk in response.iter_content(chunk_size):
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                raise ValueError(f"{response.url} is more than the {max_bytes} byte limit")
+            file.write(chunk)
+    return size
+
+def download(url, save_path, timeout=HTTP_TIMEOUT, max_bytes=HTTP_MAX_BYTES, chunk_size=64 * 1024, headers=None, cache=None):
+    """Stream url to save_path in chunks, through a temp file that is renamed into place.
+
+    With a cache (the shared http_cache() by default, cache=False to skip it), fresh entries
+    are served without a request and stale ones are revalidated with If-None-Match /
+    If-Modified-Since. Raises ValueError if the body is larger than max_bytes.
+    Returns the byte count, rate and whether the body came from the cache.
+    """
+    import time
+    start = time.perf_counter()
+    cache = http_cache() if cache is None else cache
+    entry = cache.lookup(url) if cache else None
+    from_cache = False
+
+    def check_cached_size(entry):
+        # The same limit as the network path, for bodies served from the cache
+        if max_bytes and entry.get('size', 0) > max_bytes:
+            raise ValueError(f"{url} is {entry['size']} bytes, more than the {max_bytes} byte limit")
+
+    if entry and cache.is_fresh(entry):
+        check_cached_size(entry)
+        cache.copy_to(url, entry, save_path)
+        size, from_cache = entry['size'], True
+    else:
+        request_headers = dict(headers or {}, **HTTPCache.conditional_headers(entry))
+        with http_session().get(url, stream=True, timeout=timeout, headers=request_headers) as response:
+            if response.status_code == 304 and entry:
+                check_cached_size(entry)
+                cache.copy_to(url, cache.revalidated(url, entry, response.headers), save_path)
+                size, from_cache = entry['size'], True
+            else:
+                response.raise_for_status()
+                size = write_response(response, save_path, max_bytes, chunk_size)
+                if cache:
+                    cache.store(url, save_path, response.headers)
+    seconds = time.perf_counter() - start
+    stats = {"url": url, "bytes": size, "seconds": seconds, "bytes_per_second": size / seconds if seconds else 0.0,
+             "from_cache": from_cache}
+    print(f"Downloaded {url}{' (cached)' if from_cache else ''}: {size} bytes in {seconds:.2f}s "
+          f"({stats['bytes_per_second'] / 1024:.1f} KiB/s)")
+    return stats
+
 # B3: Fetch Data from an API
-def B3(url, save_path):
+def B3(url, save_path, timeout=HTTP_TIMEOUT, max_bytes=HTTP_MAX_BYTES):
     if not B12(save_path):
         return None
-    import requests
-    response = requests.get(url)
-    with open(save_path, 'w') as file:
-        file.write(response.text)
+    return download(url, save_path, timeout=timeout, max_bytes=max_bytes)
 
 def B4(repo_url, commit_message):
     import subprocess
@@ -27,37 +278,483 @@ def B4(repo_url, commit_message):
     subprocess.run(["git", "-C", "/data/repo", "commit", "-m", commit_message])
 
 # B5: Run SQL Query
-def B5(db_path, query, output_filename):
+def write_rows(output_filename, columns, chunks):
+    # Write row chunks as they arrive; the format comes from the output file's extension
+    import csv
+    rows_written = 0
+    extension = os.path.splitext(output_filename)[1].lower()
+    with open(output_filename, 'w', newline='' if extension == '.csv' else None) as file:
+        if extension == '.csv':
+            writer = csv.writer(file)
+            writer.writerow(columns)
+            for chunk in chunks:
+                writer.writerows(chunk)
+                rows_written += len(chunk)
+        elif extension == '.jsonl':
+            import json
+            for chunk in chunks:
+                for row in chunk:
+                    file.write(json.dumps(dict(zip(columns, row)), default=str) + '\n')
+                rows_written += len(chunk)
+        else:
+            # Same text as str(cur.fetchall()), without building the list
+            file.write('[')
+            for chunk in chunks:
+                for row in chunk:
+                    file.write(', ' + repr(row) if rows_written else repr(row))
+                    rows_written += 1
+            file.write(']')
+    return rows_written
+
+DUCKDB_READERS = {
+    '.csv': "read_csv_auto('{}')",
+    '.tsv': "read_csv_auto('{}', delim='\t')",
+    '.json': "read_json_auto('{}')",
+    '.jsonl': "read_json_auto('{}', format='newline_delimited')",
+    '.ndjson': "read_json_auto('{}', format='newline_delimited')",
+}
+
+def sql_string(value):
+    return value.replace("'", "''")
+
+def view_name(relative_path):
+    # "logs/app-1.csv" -> "logs_app_1"
+    import re
+    name = re.sub(r'\W+', '_', os.path.splitext(relative_path)[0]).strip('_').lower()
+    return name if name and not name[0].isdigit() else f"t_{name}"
+
+def register_duckdb_views(conn, path, query=None):
+    """Expose data files to DuckDB without loading them.
+
+    CSV/TSV/JSON/JSONL files become views named after their path (relative to a directory),
+    each directory's *.log files become one "<dir>_log" view of (line, filename), and SQLite
+    databases are attached read-only through DuckDB's sqlite scanner under their name.
+    When scanning a directory, a database is only attached if query mentions its name, and
+    one that fails to attach (not SQLite, scanner extension unavailable) is skipped.
+    A single file is registered under its own name. Returns the registered names.
+    """
+    import re
+    import duckdb
+    root = path if os.path.isdir(path) else os.path.dirname(path)
+    if os.path.isdir(path):
+        walk = os.walk(path)
+    else:
+        walk = [(root, [], [os.path.basename(path)])]
+    names = []
+    for directory, _, files in walk:
+        if any(name.endswith('.log') for name in files):
+            # A single .log file is a view of its own, named after the file
+            if os.path.isdir(path):
+                name = view_name(os.path.join(os.path.relpath(directory, root), 'log'))
+                pattern = sql_string(os.path.join(directory, '*.log'))
+            else:
+                name, pattern = view_name(os.path.basename(path)), sql_string(path)
+            conn.execute(f"""CREATE OR REPLACE VIEW "{name}" AS SELECT * FROM read_csv('{pattern}', columns={{'line': 'VARCHAR'}},
+                             header=false, delim=chr(31), quote='', escape='', filename=true)""")
+            names.append(name)
+        for file in files:
+            file_path = os.path.join(directory, file)
+            extension = os.path.splitext(file)[1].lower()
+            name = view_name(os.path.relpath(file_path, root))
+            if extension in DUCKDB_READERS:
+                conn.execute(f'CREATE OR REPLACE VIEW "{name}" AS SELECT * FROM {DUCKDB_READERS[extension].format(sql_string(file_path))}')
+                names.append(name)
+            elif extension in ('.db', '.sqlite', '.sqlite3'):
+                if not os.path.isdir(path):
+                    # Asked for by path: failures are the caller's error
+                    conn.execute(f"""ATTACH '{sql_string(file_path)}' AS "{name}" (TYPE sqlite, READ_ONLY)""")
+                    names.append(name)
+                    continue
+                if query is not None and not re.search(rf'(?<![\w$]){re.escape(name)}(?![\w$])', query, re.IGNORECASE):
+                    continue
+                try:
+                    conn.execute(f"""ATTACH '{sql_string(file_path)}' AS "{name}" (TYPE sqlite, READ_ONLY)""")
+                except duckdb.Error as e:
+                    print(f"Skipping {file_path}: {e}")
+                    continue
+                names.append(name)
+    return names
+
+def B5(db_path, query, output_filename, chunk_size=10_000, engine=None, threads=None, explain=False, profile_path=None):
+    # Rows are streamed to output_filename (.csv, .jsonl, .parquet or str(list) text); returns the row count.
+    # engine='duckdb' runs the query on DuckDB over any /data file or directory; .db files default to SQLite.
     if not B12(db_path):
         return None
-    import sqlite3, duckdb
-    conn = sqlite3.connect(db_path) if db_path.endswith('.db') else duckdb.connect(db_path)
-    cur = conn.cursor()
-    cur.execute(query)
-    result = cur.fetchall()
-    conn.close()
-    with open(output_filename, 'w') as file:
-        file.write(str(result))
-    return result
+    import duckdb
+    if engine is None:
+        engine = 'sqlite' if db_path.endswith('.db') else 'duckdb'
+    if engine == 'sqlite' and not explain and not profile_path:
+        if output_filename.lower().endswith('.parquet'):
+            raise ValueError("Parquet output needs the DuckDB engine")
+        # Pooled read-only connection, with small results cached until the database changes
+        from tasksA import open_query
+        with open_query(db_path, query, chunk_size=chunk_size) as (columns, chunks):
+            return write_rows(output_filename, columns, chunks)
+
+    if db_path.endswith('.duckdb') or (os.path.isfile(db_path) and os.path.splitext(db_path)[1].lower() not in DUCKDB_READERS
+                                       and not db_path.endswith(('.db', '.sqlite', '.sqlite3', '.log'))):
+        conn = duckdb.connect(db_path)
+    else:
+        conn = duckdb.connect()
+        names = register_duckdb_views(conn, db_path, query)
+        if os.path.isfile(db_path) and db_path.endswith(('.db', '.sqlite', '.sqlite3')):
+            # A single SQLite database: let the query use its table names unqualified
+            conn.execute(f'USE "{names[0]}"')
+    try:
+        if threads:
+            conn.execute(f"SET threads = {int(threads)}")
+        if explain:
+            # Write the query plan instead of the results
+            plan = conn.execute(f"EXPLAIN {query}").fetchall()
+            with open(output_filename, 'w') as file:
+                file.write('\n'.join(row[1] for row in plan))
+            return len(plan)
+        if profile_path:
+            conn.execute("PRAGMA enable_profiling = 'json'")
+            conn.execute(f"PRAGMA profiling_output = '{sql_string(profile_path)}'")
+        if output_filename.lower().endswith('.parquet'):
+            # DuckDB streams the result into the Parquet file itself
+            conn.execute(f"COPY ({query}) TO '{sql_string(output_filename)}' (FORMAT PARQUET)")
+            return conn.execute(f"SELECT count(*) FROM read_parquet('{sql_string(output_filename)}')").fetchone()[0]
+        result = conn.execute(query)
+        columns = [column[0] for column in result.description or ()]
+        return write_rows(output_filename, columns, iter(lambda: result.fetchmany(chunk_size), []))
+    finally:
+        conn.close()
+
+def run_async(coroutine):
+    # asyncio.run can't be nested in the FastAPI event loop, so run it on its own thread there
+    import asyncio
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+def url_filename(index, url):
+    # "0007-example.com_path_page.html": unique, ordered and safe to use as a file name
+    import re
+    slug = re.sub(r'[^A-Za-z0-9._-]+', '_', url.split('://', 1)[-1]).strip('_')[:100]
+    return f"{index:06d}-{slug or 'index'}"
+
+async def scrape_urls(urls, output_path, concurrency=50, per_host=6, retries=3, backoff=0.5,
+                      timeout=HTTP_TIMEOUT, max_bytes=HTTP_MAX_BYTES, chunk_size=64 * 1024):
+    """Fetch many URLs concurrently and stream them to disk.
+
+    At most `concurrency` requests are in flight overall and `per_host` per host. Transport
+    errors, 429s and 5xx responses are retried with exponential backoff; other HTTP errors
+    fail. If output_path ends in .jsonl every response becomes one {"url", "status", "content"}
+    line there, otherwise it is a directory that gets one file per URL. Returns a
+    throughput/failure summary.
+    """
+    import asyncio, json, random, time
+    from urllib.parse import urlsplit
+    import httpx
+
+    archive = output_path.endswith('.jsonl')
+    if not archive:
+        os.makedirs(output_path, exist_ok=True)
+    limit = asyncio.Semaphore(concurrency)
+    host_limits = {}
+    summary = {"total": len(urls), "succeeded": 0, "failed": 0, "bytes": 0, "failures": []}
+    start = time.perf_counter()
+
+    async def fetch(client, index, url, archive_file):
+        for attempt in range(retries + 1):
+            try:
+                host_limit = host_limits.setdefault(urlsplit(url).netloc, asyncio.Semaphore(per_host))
+                # Wait for the host slot first, so tasks queued behind a busy host don't hold global slots
+                async with host_limit, limit:
+                    async with client.stream('GET', url) as response:
+                        response.raise_for_status()
+                        if archive:
+                            body = bytearray()
+                            async for chunk in response.aiter_bytes(chunk_size):
+                                body += chunk
+                                if max_bytes and len(body) > max_bytes:
+                                    raise ValueError(f"more than the {max_bytes} byte limit")
+                            # Single event loop thread: each line is written whole, no lock needed
+                            archive_file.write(json.dumps({"url": url, "status": response.status_code,
+                                                           "content": body.decode(response.encoding or 'utf-8', 'replace')}) + '\n')
+                            size = len(body)
+                        else:
+                            size = 0
+                            with atomic_output(os.path.join(output_path, url_filename(index, url))) as file:
+                                async for chunk in response.aiter_bytes(chunk_size):
+                                    size += len(chunk)
+                                    if max_bytes and size > max_bytes:
+                                        raise ValueError(f"more than the {max_bytes} byte limit")
+                                    file.write(chunk)
+                summary["succeeded"] += 1
+                summary["bytes"] += size
+                return
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if isinstance(e, httpx.HTTPStatusError):
+                    retryable = e.response.status_code == 429 or e.response.status_code >= 500
+                else:
+                    retryable = not isinstance(e, httpx.UnsupportedProtocol)
+                if attempt == retries or not retryable:
+                    error = e
+                    break
+                await asyncio.sleep(backoff * 2 ** attempt * (1 + random.random()))
+            except (httpx.InvalidURL, ValueError, OSError) as e:
+                # Malformed URLs, size limit overruns and local write errors fail just this URL
+                error = e
+                break
+        summary["failed"] += 1
+        summary["failures"].append({"url": url, "error": str(error) or type(error).__name__})
+
+    connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=httpx.Timeout(read, connect=connect), limits=limits, follow_redirects=True) as client:
+        archive_file = open(output_path, 'w') if archive else None
+        try:
+            await asyncio.gather(*(fetch(client, index, url, archive_file) for index, url in enumerate(urls)))
+        finally:
+            if archive_file:
+                archive_file.close()
+
+    seconds = time.perf_counter() - start
+    summary.update(seconds=seconds, urls_per_second=len(urls) / seconds if seconds else 0.0,
+                   bytes_per_second=summary["bytes"] / seconds if seconds else 0.0)
+    print(f"Scraped {summary['succeeded']}/{summary['total']} URLs ({summary['failed']} failed), "
+          f"{summary['bytes']} bytes in {seconds:.2f}s ({summary['urls_per_second']:.1f} URLs/s)")
+    return summary
 
 # B6: Web Scraping
-def B6(url, output_filename):
-    import requests
-    result = requests.get(url).text
-    with open(output_filename, 'w') as file:
-        file.write(str(result))
+def B6(url=None, output_filename=None, timeout=HTTP_TIMEOUT, max_bytes=HTTP_MAX_BYTES, urls=None, urls_file=None,
+       concurrency=50, per_host=6, retries=3):
+    # A list of URLs (or a file with one per line) is scraped concurrently into a directory or .jsonl archive
+    if urls or urls_file:
+        urls = list(urls or [])
+        if urls_file:
+            with open(urls_file) as file:
+                urls += [line.strip() for line in file if line.strip() and not line.startswith('#')]
+        return run_async(scrape_urls(urls, output_filename, concurrency=concurrency, per_host=per_host,
+                                     retries=retries, timeout=timeout, max_bytes=max_bytes))
+    return download(url, output_filename, timeout=timeout, max_bytes=max_bytes)
 
 # B7: Image Processing
-def B7(image_path, output_path, resize=None):
+# Uncompressed pixel layouts we can read straight from disk: rawmode -> (bytes per pixel, channels to keep, in order)
+RAW_LAYOUTS = {
+    'L': (1, [0]),
+    'RGB': (3, [0, 1, 2]),
+    'BGR': (3, [2, 1, 0]),
+    'RGBX': (4, [0, 1, 2]),
+    'BGRX': (4, [2, 1, 0]),
+    'RGBA': (4, [0, 1, 2, 3]),
+    'BGRA': (4, [2, 1, 0, 3]),
+}
+
+def raw_row_reader(img, path):
+    """Read rows [y0, y1) of an uncompressed image (BMP, PPM/PGM, TGA, raw TIFF strips) straight from the file.
+
+    Returns None when the file isn't stored as full-width raw rows that we know how to read.
+    """
+    import numpy as np
     from PIL import Image
+    width, height = img.size
+    strips = []
+    for tile in img.tile:
+        name, (x0, y0, x1, y1), offset, args = tile[:4]
+        rawmode, stride, direction = (args, 0, 1) if isinstance(args, str) else (tuple(args) + (0, 1))[:3]
+        if name != 'raw' or (x0, x1) != (0, width) or rawmode not in RAW_LAYOUTS:
+            return None
+        pixel_bytes, channels = RAW_LAYOUTS[rawmode]
+        if len(channels) != len(img.getbands()):
+            return None
+        strips.append((y0, y1, offset, stride or width * pixel_bytes, direction))
+    if not strips:
+        return None
+
+    def read_block(first, rows, stride):
+        # Plain reads rather than np.memmap, so pages we are done with don't stay mapped into our memory
+        with open(path, 'rb') as file:
+            file.seek(first)
+            return np.frombuffer(file.read(rows * stride), dtype=np.uint8).reshape(rows, stride)
+
+    def read_rows(start, stop):
+        rows = np.empty((stop - start, width, len(channels)), dtype=np.uint8)
+        for y0, y1, offset, stride, direction in strips:
+            lo, hi = max(start, y0), min(stop, y1)
+            if lo >= hi:
+                continue
+            if direction >= 0:
+                block = read_block(offset + (lo - y0) * stride, hi - lo, stride)
+            else:
+                # Bottom-up storage (BMP, TGA): file row 0 is the last image row
+                block = read_block(offset + (y1 - hi) * stride, hi - lo, stride)[::-1]
+            pixels = block[:, :width * pixel_bytes].reshape(hi - lo, width, pixel_bytes)
+            rows[lo - start:hi - start] = pixels[:, :, channels]
+        return Image.fromarray(rows[:, :, 0] if len(channels) == 1 else rows, img.mode)
+
+    return read_rows
+
+class PNGStreamWriter:
+    """Write an 8-bit L/RGB/RGBA PNG one strip of rows at a time."""
+
+    COLOR_TYPES = {'L': 0, 'RGB': 2, 'RGBA': 6}
+
+    def __init__(self, path, size, mode):
+        import struct, zlib
+        self.file = open(path, 'wb')
+        self.compressor = zlib.compressobj(6)
+        self.file.write(b'\x89PNG\r\n\x1a\n')
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', size[0], size[1], 8, self.COLOR_TYPES[mode], 0, 0, 0))
+
+    def _chunk(self, kind, data):
+        import struct, zlib
+        self.file.write(struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data)))
+
+    def write(self, img):
+        # Filter type 0 (None) for every row, then deflate
+        raw = img.tobytes()
+        row_bytes = len(raw) // img.height
+        data = self.compressor.compress(b''.join(b'\x00' + raw[i:i + row_bytes] for i in range(0, len(raw), row_bytes)))
+        if data:
+            self._chunk(b'IDAT', data)
+
+    def close(self):
+        self._chunk(b'IDAT', self.compressor.flush())
+        self._chunk(b'IEND', b'')
+        self.file.close()
+
+def tiled_resize(image_path, output_path, resize=None, memory_budget=256 * 1024 ** 2):
+    """Resize a very large image strip by strip, keeping memory near memory_budget.
+
+    Each output strip is resampled from just the source rows under its filter support, so
+    the result matches Image.resize with the same (bicubic) filter. Uncompressed sources are
+    read row range by row range from disk and JPEGs are decoded at a reduced scale with draft().
+    Other formats (PNG, compressed TIFF) can only be decoded whole; that is done only if it fits
+    memory_budget and Pillow's decompression-bomb limit, otherwise ValueError/DecompressionBombError
+    is raised. PNG output is written incrementally; other formats are assembled at output size.
+    """
+    import math
+    from PIL import Image
+    limit, Image.MAX_IMAGE_PIXELS = Image.MAX_IMAGE_PIXELS, None
+    try:
+        img = Image.open(image_path)
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+    with img:
+        size = tuple(int(v) for v in resize) if resize else img.size
+        read_rows = raw_row_reader(img, image_path)
+        if read_rows is None:
+            if img.format == 'JPEG':
+                img.draft(img.mode, size)
+            # Whole-image decode: keep Pillow's bomb guard and the budget
+            if limit and img.width * img.height > 2 * limit:
+                raise Image.DecompressionBombError(
+                    f"{image_path}: {img.width * img.height} pixels exceeds the limit of {2 * limit} pixels")
+            decoded = img.width * img.height * len(img.getbands())
+            if decoded > memory_budget:
+                raise ValueError(f"{image_path}: {img.format} can't be read in strips and decoding it whole "
+                                 f"needs {decoded} bytes, more than the {memory_budget} byte memory budget")
+            img.load()
+            read_rows = lambda start, stop: img.crop((0, start, img.width, stop))
+        src_width, src_height = img.size
+        mode = img.mode
+
+        scale_y = src_height / size[1]
+        # Bicubic support is 2 source pixels, stretched by the scale when shrinking
+        margin = math.ceil(2 * max(scale_y, 1)) + 2
+        row_bytes = src_width * len(img.getbands())
+        budget_rows = max(1, memory_budget // (3 * row_bytes))
+        out_rows = max(1, int((budget_rows - 2 * margin) / scale_y))
+
+        png = output_path.lower().endswith('.png') and mode in PNGStreamWriter.COLOR_TYPES
+        writer = PNGStreamWriter(output_path, size, mode) if png else None
+        output = None if png else Image.new(mode, size)
+        try:
+            for out_y0 in range(0, size[1], out_rows):
+                out_y1 = min(size[1], out_y0 + out_rows)
+                top, bottom = out_y0 * scale_y, out_y1 * scale_y
+                y0, y1 = max(0, math.floor(top) - margin), min(src_height, math.ceil(bottom) + margin)
+                strip = read_rows(y0, y1).resize((size[0], out_y1 - out_y0), Image.BICUBIC,
+                                                 box=(0, top - y0, src_width, bottom - y0))
+                if writer:
+                    writer.write(strip)
+                else:
+                    output.paste(strip, (0, out_y0))
+        finally:
+            if writer:
+                writer.close()
+        if output is not None:
+            output.save(output_path)
+
+def process_image(image_path, output_path, resize=None, tiled=None, memory_budget=256 * 1024 ** 2):
+    # Resize one image, decoding JPEGs near the target size; returns the input size in bytes.
+    # Images whose decoded size would exceed memory_budget (or tiled=True) go through tiled_resize.
+    from PIL import Image
+    if tiled is None:
+        # Header only. Images that can't be read in strips (PNG, JPEG, compressed TIFF) take the normal
+        # path, where JPEGs are drafted down and Pillow's bomb guard still applies
+        limit, Image.MAX_IMAGE_PIXELS = Image.MAX_IMAGE_PIXELS, None
+        try:
+            with Image.open(image_path) as img:
+                tiled = (img.width * img.height * len(img.getbands()) > memory_budget
+                         and raw_row_reader(img, image_path) is not None)
+        finally:
+            Image.MAX_IMAGE_PIXELS = limit
+    if tiled:
+        tiled_resize(image_path, output_path, resize, memory_budget=memory_budget)
+        return os.path.getsize(image_path)
+
+    with Image.open(image_path) as img:
+        if resize:
+            size = tuple(int(v) for v in resize)
+            if img.format == 'JPEG':
+                # Let the decoder scale by 1/2, 1/4 or 1/8 while reading, staying at or above the target size
+                img.draft(img.mode, size)
+            width, height = img.size
+            if abs(size[0] / size[1] - width / height) * min(size) < 1 and size[0] <= width and size[1] <= height:
+                # Same aspect ratio and shrinking: thumbnail() reduces in place with reduce() + resample
+                img.thumbnail(size, reducing_gap=2.0)
+                if img.size != size:
+                    img = img.resize(size)
+            else:
+                img = img.resize(size, reducing_gap=2.0)
+        img.save(output_path)
+    return os.path.getsize(image_path)
+
+def B7(image_path, output_path, resize=None, max_workers=None, tiled=None, memory_budget=256 * 1024 ** 2):
+    # image_path can also be a directory or a glob; every image then goes to output_path (a directory) on a process pool
     if not B12(image_path):
         return None
     if not B12(output_path):
         return None
-    img = Image.open(image_path)
-    if resize:
-        img = img.resize(resize)
-    img.save(output_path)
+    import glob
+    if not os.path.isdir(image_path) and not glob.has_magic(image_path):
+        process_image(image_path, output_path, resize, tiled=tiled, memory_budget=memory_budget)
+        return None
+
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+    extensions = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tif', '.tiff')
+    pattern = os.path.join(image_path, '*') if os.path.isdir(image_path) else image_path
+    paths = sorted(path for path in glob.glob(pattern) if path.lower().endswith(extensions) and os.path.isfile(path))
+    # Mirror paths below the deepest common directory, so a glob spanning directories can't overwrite same-named images
+    base = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths]) if paths else image_path
+    outputs = [os.path.join(output_path, os.path.relpath(os.path.abspath(path), base)) for path in paths]
+    for directory in {os.path.dirname(output) for output in outputs} | {output_path}:
+        os.makedirs(directory, exist_ok=True)
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        input_bytes = sum(executor.map(process_image, paths, outputs, [resize] * len(paths), [tiled] * len(paths),
+                                       [memory_budget] * len(paths), chunksize=16))
+    seconds = time.perf_counter() - start
+    report = {
+        "images": len(paths),
+        "seconds": seconds,
+        "images_per_second": len(paths) / seconds if seconds else 0.0,
+        "input_mb_per_second": input_bytes / 1024 ** 2 / seconds if seconds else 0.0,
+    }
+    print(f"Processed {len(paths)} images in {seconds:.2f}s ({report['images_per_second']:.1f} images/s, "
+          f"{report['input_mb_per_second']:.1f} MB/s)")
+    return report
 
 # B8: Audio Transcription
 def B8(audio_path):
@@ -68,27 +765,267 @@ def B8(audio_path):
         return openai.Audio.transcribe("whisper-1", audio_file)
 
 # B9: Markdown to HTML Conversion
-def B9(md_path, output_path):
+_markdown_converter = None
+
+def markdown_to_html(text):
+    # One markdown.Markdown per process, reset between documents instead of rebuilt for each one
+    global _markdown_converter
+    if _markdown_converter is None:
+        import markdown
+        _markdown_converter = markdown.Markdown()
+    return _markdown_converter.reset().convert(text)
+
+def convert_markdown_file(md_path, output_path, known_hash=None):
+    # Convert unless the source still has known_hash and its HTML exists; returns (source hash, converted?)
+    import hashlib
+    with open(md_path, 'rb') as file:
+        source = file.read()
+    digest = hashlib.sha256(source).hexdigest()
+    if digest == known_hash and os.path.exists(output_path):
+        return digest, False
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as file:
+        file.write(markdown_to_html(source.decode('utf-8')))
+    return digest, True
+
+def convert_markdown_dir(md_dir, output_dir, max_workers=None, chunksize=64):
+    """Convert every .md file under md_dir to .html under output_dir across worker processes.
+
+    A manifest of source hashes in output_dir lets later runs skip files whose HTML is current.
+    """
+    import json, time
+    from concurrent.futures import ProcessPoolExecutor
     import markdown
+    start = time.perf_counter()
+    manifest_path = os.path.join(output_dir, '.b9-manifest.json')
+    try:
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        manifest = {}
+    # A different Markdown version may render differently, so it invalidates every entry
+    known = manifest.get('files', {}) if manifest.get('markdown_version') == markdown.__version__ else {}
+
+    sources = sorted(os.path.relpath(os.path.join(root, name), md_dir)
+                     for root, _, files in os.walk(md_dir) for name in files if name.endswith('.md'))
+    outputs = [os.path.join(output_dir, os.path.splitext(source)[0] + '.html') for source in sources]
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(convert_markdown_file, [os.path.join(md_dir, source) for source in sources],
+                                    outputs, [known.get(source) for source in sources], chunksize=chunksize))
+
+    with open(manifest_path + '.tmp', 'w') as file:
+        json.dump({'markdown_version': markdown.__version__,
+                   'files': {source: digest for source, (digest, _) in zip(sources, results)}}, file)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    converted = sum(1 for _, changed in results if changed)
+    summary = {"files": len(sources), "converted": converted, "skipped": len(sources) - converted,
+               "seconds": time.perf_counter() - start}
+    print(f"Converted {converted} of {len(sources)} Markdown files in {summary['seconds']:.2f}s")
+    return summary
+
+def B9(md_path, output_path, max_workers=None):
     if not B12(md_path):
         return None
     if not B12(output_path):
         return None
+    if os.path.isdir(md_path):
+        # A directory of .md files is converted into output_path as a directory of .html files
+        return convert_markdown_dir(md_path, output_path, max_workers=max_workers)
     with open(md_path, 'r') as file:
-        html = markdown.markdown(file.read())
+        html = markdown_to_html(file.read())
     with open(output_path, 'w') as file:
         file.write(html)
 
 # B10: API Endpoint for CSV Filtering
-def B10():
-    from flask import Flask, request, jsonify
-    app = Flask(__name__)
-    @app.route('/filter_csv', methods=['POST'])
-    def filter_csv():
+class CSVTableCache:
+    """Parsed CSV columns kept in memory per (path, mtime, size), with hash indexes built on demand.
+
+    Columns are loaded only when a query needs them. With columnar=True the first column load
+    converts the CSV once to Parquet under cache_dir (parsed by pandas, so types match the
+    default mode) and later column loads read from there.
+    """
+
+    def __init__(self, max_tables=4, columnar=False, cache_dir=None):
+        import threading
+        from collections import OrderedDict
+        self.max_tables = max_tables
+        self.columnar = columnar
+        self.cache_dir = cache_dir or os.path.expanduser('~/.cache/csv-columns')
+        self._tables = OrderedDict()  # realpath -> table dict
+        self._lock = threading.RLock()
+
+    def _table(self, csv_path):
+        path = os.path.realpath(csv_path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        table = self._tables.get(path)
+        if table is None or table['version'] != version:
+            import pandas as pd
+            # Header only, to know the column order without parsing the file
+            header = list(pd.read_csv(path, nrows=0).columns)
+            table = self._tables[path] = {'version': version, 'header': header, 'columns': {}, 'indexes': {},
+                                          'parquet': None}
+            while len(self._tables) > self.max_tables:
+                self._tables.popitem(last=False)
+        self._tables.move_to_end(path)
+        return path, table
+
+    def _to_parquet(self, path, version):
+        import duckdb, hashlib
+        os.makedirs(self.cache_dir, exist_ok=True)
+        key = hashlib.sha256(f"{path}:{version[0]}:{version[1]}".encode()).hexdigest()
+        parquet_path = os.path.join(self.cache_dir, f"{key}.parquet")
+        if not os.path.exists(parquet_path):
+            import pandas as pd
+            # pandas does the parsing, so dtypes (and filter results) are the same as reading the CSV directly
+            frame = pd.read_csv(path)
+            with duckdb.connect() as conn:
+                conn.register('csv_frame', frame)
+                conn.execute(f"COPY csv_frame TO '{sql_string(parquet_path + '.tmp')}' (FORMAT PARQUET)")
+            os.replace(f"{parquet_path}.tmp", parquet_path)
+        return parquet_path
+
+    def columns(self, csv_path, names):
+        # The requested columns as a DataFrame, parsing only the ones not loaded yet
         import pandas as pd
-        data = request.json
+        with self._lock:
+            path, table = self._table(csv_path)
+            unknown = [name for name in names if name not in table['header']]
+            if unknown:
+                raise KeyError(f"Unknown column(s): {', '.join(unknown)}")
+            missing = [name for name in names if name not in table['columns']]
+            if missing:
+                if self.columnar and table['parquet'] is None:
+                    table['parquet'] = self._to_parquet(path, table['version'])
+                if table['parquet']:
+                    import duckdb
+                    with duckdb.connect() as conn:
+                        projection = ', '.join('"' + name.replace('"', '""') + '"' for name in missing)
+                        frame = conn.execute(f"SELECT {projection} FROM read_parquet('{sql_string(table['parquet'])}')").df()
+                else:
+                    frame = pd.read_csv(path, usecols=missing)
+                for name in missing:
+                    table['columns'][name] = frame[name]
+            return pd.DataFrame({name: table['columns'][name] for name in names})
+
+    def positions(self, csv_path, column, value):
+        # Row positions whose field text equals filter_text(value), from a hash index built the
+        # first time the column is filtered. Text, not inferred dtypes, so streaming agrees.
+        import numpy as np
+        import pandas as pd
+        with self._lock:
+            path, table = self._table(csv_path)
+            if column not in table['header']:
+                raise KeyError(f"Unknown column(s): {column}")
+            index = table['indexes'].get(column)
+            if index is None:
+                series = pd.read_csv(path, usecols=[column], dtype=str)[column]
+                index = table['indexes'][column] = series.groupby(series, sort=False).indices
+        return index.get(filter_text(value), np.empty(0, dtype=np.int64))
+
+    def filter(self, csv_path, filter_column, filter_value, columns=None, after=None, limit=None):
+        # Matching rows plus the cursor for the next page (None when this page is the last)
+        import numpy as np
+        with self._lock:
+            _, table = self._table(csv_path)
+            columns = list(columns or table['header'])
+        rows = self.positions(csv_path, filter_column, filter_value)
+        start = 0 if after is None else int(np.searchsorted(rows, after, side='right'))
+        stop = len(rows) if limit is None else min(start + limit, len(rows))
+        next_after = int(rows[stop - 1]) if stop < len(rows) else None
+        page = self.columns(csv_path, columns).iloc[rows[start:stop]]
+        if filter_column in columns:
+            page = page.assign(**{filter_column: filter_output_value(filter_text(filter_value))})
+        return page, next_after
+
+    def header(self, csv_path):
+        with self._lock:
+            return list(self._table(csv_path)[1]['header'])
+
+def filter_text(value):
+    # filter_value as the CSV field text it matches: 7 -> "7", True -> "True"
+    return value if isinstance(value, str) else str(value)
+
+def filter_output_value(text):
+    # What matching rows report in the filter column: the number when the text is one, else the
+    # text. Per value rather than per column dtype, so cached and streamed results agree.
+    import pandas as pd
+    number = pd.to_numeric(pd.Series([text]), errors='coerce')
+    return text if number.isna().all() else number.iloc[0].item()
+
+csv_table_cache = CSVTableCache(columnar=os.getenv('CSV_CACHE_COLUMNAR', '').lower() in ('1', 'true', 'yes'))
+CSV_STREAM_CHUNK_ROWS = int(os.getenv('CSV_STREAM_CHUNK_ROWS', 50_000))
+
+def stream_filtered_csv(csv_path, filter_column, filter_value, columns, after=None, limit=None, chunk_size=CSV_STREAM_CHUNK_ROWS):
+    # Yield matching rows as NDJSON while scanning the CSV chunk by chunk. The cursor is the
+    # row position in the file; if limit cuts the page short, the last line is {"next_after": N}.
+    # The filter column is read as text, since chunks would each infer their own dtype.
+    import json
+    import pandas as pd
+    needed = set(columns) | {filter_column}
+    text = filter_text(filter_value)
+    sent, last = 0, after
+    with pd.read_csv(csv_path, usecols=lambda name: name in needed, dtype={filter_column: str},
+                     chunksize=chunk_size) as reader:
+        for chunk in reader:
+            if after is not None:
+                if chunk.index[-1] <= after:
+                    continue
+                chunk = chunk[chunk.index > after]
+            matches = chunk[chunk[filter_column] == text]
+            if not len(matches):
+                continue
+            if filter_column in columns:
+                matches = matches.assign(**{filter_column: filter_output_value(text)})
+            if limit is not None and sent + len(matches) > limit:
+                matches = matches.iloc[:limit - sent]
+                if len(matches):
+                    last = int(matches.index[-1])
+                    yield matches[columns].to_json(orient='records', lines=True).rstrip('\n') + '\n'
+                yield json.dumps({'next_after': last}) + '\n'
+                return
+            sent, last = sent + len(matches), int(matches.index[-1])
+            yield matches[columns].to_json(orient='records', lines=True).rstrip('\n') + '\n'
+
+def B10(app):
+    # Serve /filter_csv from the given FastAPI app, answering from csv_table_cache.
+    # Optional body fields: columns, limit and after (cursor pagination), stream (NDJSON,
+    # also chosen by Accept: application/x-ndjson).
+    import json
+    from fastapi import Body, HTTPException, Request
+    from fastapi.responses import Response, StreamingResponse
+
+    @app.post('/filter_csv')
+    def filter_csv(request: Request, data: dict = Body(...)):
         csv_path, filter_column, filter_value = data['csv_path'], data['filter_column'], data['filter_value']
-        B12(csv_path)
-        df = pd.read_csv(csv_path)
-        filtered = df[df[filter_column] == filter_value]
-        return jsonify(filtered.to_dict(orient='records'))
\ No newline at end of file
+        if not B12(csv_path):
+            raise HTTPException(status_code=403, detail="Access outside /data is not allowed.")
+        after, limit = data.get('after'), data.get('limit')
+        if (after is not None and (not isinstance(after, int) or after < -1)) or \
+                (limit is not None and (not isinstance(limit, int) or limit < 1)):
+            raise HTTPException(status_code=400, detail="limit must be a positive integer and after a row cursor")
+        stream = data.get('stream') or 'application/x-ndjson' in request.headers.get('accept', '')
+        try:
+            if stream:
+                # Validate before the response starts, so errors still get a status code
+                header = csv_table_cache.header(csv_path)
+                columns = list(data.get('columns') or header)
+                unknown = [name for name in [filter_column, *columns] if name not in header]
+                if unknown:
+                    raise KeyError(f"Unknown column(s): {', '.join(unknown)}")
+                rows = stream_filtered_csv(csv_path, filter_column, filter_value, columns, after, limit)
+                return StreamingResponse(rows, media_type='application/x-ndjson')
+            filtered, next_after = csv_table_cache.filter(csv_path, filter_column, filter_value,
+                                                          data.get('columns'), after, limit)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File not found")
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if after is None and limit is None:
+            return Response(filtered.to_json(orient='records'), media_type='application/json')
+        return Response(f'{{"rows": {filtered.to_json(orient="records")}, "next_after": {json.dumps(next_after)}}}',
+                        media_type='application/json')
+
+    return app